@@ -1,14 +1,14 @@
+import numpy as np
 import pandas as pd
 import os
 from .logger import setup_logger
 from .config import CLEANED_DATA_PATH 
-from .logger import setup_logger
 
 logger = setup_logger()
 
 def standardize_city_names(stores_df, lookup_df):
     """
-    Merge stores with cities_lookup to replace inconsistent city names
+    Map store cities through cities_lookup to replace inconsistent city names
     with standardized ones.
 
     Args:
@@ -18,31 +18,25 @@ def standardize_city_names(stores_df, lookup_df):
     Returns:
         DataFrame: Cleaned version of stores with standardized city values.
     """
-    stores_df = stores_df.copy()
-    lookup_df = lookup_df.copy()
-
-    # Normalize column names
-    stores_df.columns = stores_df.columns.str.lower()
-    lookup_df.columns = lookup_df.columns.str.lower()
-
-    merged = stores_df.merge(
-        lookup_df,
-        left_on="city", right_on="rawcity",  # lowercased
-        how="left"
-    )
+    # Normalize column names; rename without copying returns a new frame that
+    # shares the data, so the caller's DataFrame is left untouched
+    stores_df = stores_df.rename(columns=str.lower, copy=False)
+    lookup_df = lookup_df.rename(columns=str.lower, copy=False)
 
-    # Replace raw city with standardized city
-    merged = merged.drop(columns=["city", "rawcity"])
-    merged = merged.rename(columns={"standardcity": "city"})
+    # Translate raw city names through the lookup; a duplicated raw name raises
+    # instead of silently fanning out store rows. Popping and re-adding the column
+    # keeps 'city' last, matching the layout of existing cleaned stores.csv files.
+    mapping = lookup_df.set_index("rawcity")["standardcity"]
+    stores_df["city"] = stores_df.pop("city").map(mapping)
 
     # Log specific unmapped city rows if any
-    unmapped = merged[merged["city"].isnull()]
+    unmapped = stores_df[stores_df["city"].isnull()]
 
     if not unmapped.empty:
         logger.warning("Some cities could not be standardized.")
         logger.warning(f"Unmapped cities: {unmapped[['storeid', 'storename', 'region']].to_dict(orient='records')}")
 
-    return merged
+    return stores_df
 
 def parse_calendar_dates(calendar_df):
     """
@@ -60,23 +54,32 @@ def parse_calendar_dates(calendar_df):
     Returns:
         DataFrame: The cleaned and enriched calendar DataFrame, ready for analysis or loading.
     """
-    calendar_df = calendar_df.copy()
+    # Normalize column names (shares data with the caller's DataFrame, see above)
+    calendar_df = calendar_df.rename(columns=str.lower, copy=False)
 
-    # Normalize column names
-    calendar_df.columns = calendar_df.columns.str.lower()
-
-    # Convert the 'date' column to datetime format (NaT for errors)
-    calendar_df["date"] = pd.to_datetime(calendar_df["date"], errors="coerce")
+    # Convert the 'date' column to datetime format (NaT for errors).
+    # An explicit ISO format avoids dateutil's per-element fallback parser.
+    calendar_df["date"] = pd.to_datetime(calendar_df["date"], format="%Y-%m-%d", errors="coerce", cache=True)
 
     # Warn if any dates failed to parse
     if calendar_df["date"].isnull().any():
         logger.warning("Some calendar dates could not be parsed.")
 
-    # Add ISO week number for grouping and time series analysis
-    calendar_df["weeknumber"] = calendar_df["date"].dt.isocalendar().week
+    # Derive both features from day numbers in numpy rather than through
+    # .dt.isocalendar(), which builds a 3-column DataFrame to yield one column
+    days = calendar_df["date"].to_numpy(dtype="datetime64[D]")
+    invalid = np.isnat(days)
+    weekday = (days.astype(np.int64) + 3) % 7  # Monday=0; 1970-01-01 was a Thursday
+
+    # Add ISO week number for grouping and time series analysis.
+    # An ISO week belongs to the year of its Thursday (nullable UInt8 keeps NA for bad dates).
+    thursday = days + (3 - weekday)
+    year_start = thursday.astype("datetime64[Y]").astype("datetime64[D]")
+    weeknumber = (thursday - year_start).astype(np.int64) // 7 + 1
+    calendar_df["weeknumber"] = pd.arrays.IntegerArray(weeknumber.astype(np.uint8), invalid)
 
     # Mark whether each date falls on a weekend (Saturday=5, Sunday=6)
-    calendar_df["isweekend"] = calendar_df["date"].dt.weekday >= 5
+    calendar_df["isweekend"] = (weekday >= 5) & ~invalid
 
     return calendar_df
 
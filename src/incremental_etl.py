@@ -1,16 +1,74 @@
 import os
+import functools
+import shutil
 import psycopg2
 from psycopg2 import sql
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import time
-from .load_raw_data import load_raw_datasets
+from concurrent.futures import ThreadPoolExecutor
+from .load_raw_data import load_raw_datasets, iter_raw_chunks
 from .clean_data import standardize_city_names, parse_calendar_dates
 from .config import RAW_DATA_PATH, CLEANED_DATA_PATH
-from .load_to_postgres import wait_for_postgres
+from .load_to_postgres import wait_for_postgres, execute_sql_files
 from .logger import setup_logger
 
 logger = setup_logger()
 
+@functools.lru_cache(maxsize=None)
+def build_merge_sql(table, columns, key_column):
+    """
+    Build the statements stage_and_merge runs for one table layout.
+
+    Table schemas do not change at runtime, so the composed SQL is cached per
+    (table, columns, key) and reused for every chunk instead of being rebuilt.
+
+    Args:
+        table (str): Target table name.
+        columns (tuple): Column names of the incoming DataFrame, in order.
+        key_column (str): Primary key column used for the join and conflict resolution.
+
+    Returns:
+        tuple: The (create, copy, merge, drop) sql.Composed statements.
+    """
+    staging = sql.Identifier(f"stg_{table}")
+    target = sql.Identifier(table)
+    key = sql.Identifier(key_column)
+    column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+
+    create_query = sql.SQL("CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP;").format(
+        staging=staging,
+        table=target
+    )
+    copy_query = sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT CSV);").format(
+        staging=staging,
+        columns=column_list
+    )
+    update_cols = sql.SQL(', ').join(
+        sql.SQL("{col} = EXCLUDED.{col}").format(col=sql.Identifier(col))
+        for col in columns if col != key_column
+    )
+    merge_query = sql.SQL("""
+        INSERT INTO {table} ({columns})
+        SELECT {staged_columns}
+        FROM {staging} s
+        LEFT JOIN {table} t ON t.{key} = s.{key}
+        WHERE t.{key} IS NULL
+        ON CONFLICT ({key}) DO UPDATE SET {update_cols}
+        RETURNING {key}
+    """).format(
+        table=target,
+        columns=column_list,
+        staged_columns=sql.SQL(', ').join(sql.SQL("s.{}").format(sql.Identifier(col)) for col in columns),
+        staging=staging,
+        key=key,
+        update_cols=update_cols
+    )
+    drop_query = sql.SQL("DROP TABLE {staging};").format(staging=staging)
+    return create_query, copy_query, merge_query, drop_query
+
 def run_incremental_clean_and_load_all():
     """
     Perform incremental ETL by identifying and inserting only new records.
@@ -41,166 +99,219 @@ def run_incremental_clean_and_load_all():
 
     wait_for_postgres(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS)
 
+    db_config = {
+        "host": DB_HOST,
+        "port": DB_PORT,
+        "dbname": DB_NAME,
+        "user": DB_USER,
+        "password": DB_PASS
+    }
+
     # Connect to PostgreSQL
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS
-    )
+    conn = psycopg2.connect(**db_config)
 
     cursor = conn.cursor()
 
-    def fetch_existing_ids(conn, table, id_column):
-        """Retrieve all existing IDs from the specified table and column.
-            
-        Args:
-            conn (psycopg2 connection): Active database connection.
-            table (str): Table name to query.
-            id_column (str): Name of the primary key column.
-
-        Returns:
-            set: A set of existing primary key values.
+    def set_bulk_load_options(cursor):
         """
-        with conn.cursor() as cur:
-            # Compose the SQL query safely using psycopg2.sql.Identifier.
-            # This protects against:
-            # - SQL injection if table/column names are passed dynamically
-            # - Case-sensitivity issues in PostgreSQL (e.g., "ProductID" vs productid)
-            # - Reserved keyword conflicts (e.g., Date, User)
-            query = sql.SQL("SELECT {field} FROM {table};").format(
-                field=sql.Identifier(id_column),
-                table=sql.Identifier(table)
-            )
-            cur.execute(query)
-            return set(row[0] for row in cur.fetchall())
+        Tune the current transaction for bulk loading.
 
-    def filter_new_rows(df, id_column, existing_ids):
-        """
-        Filter out rows from a DataFrame that already exist in the database.
+        SET LOCAL only lasts until the transaction ends. Extra work_mem keeps the
+        anti-join's hash table in memory; commit durability is left at the server default.
 
         Args:
-            df (pd.DataFrame): Input DataFrame to filter.
-            id_column (str): Column name of the primary key.
-            existing_ids (set): Set of existing primary keys.
+            cursor (psycopg2 cursor): Cursor of the transaction to tune.
 
         Returns:
-            pd.DataFrame: Filtered DataFrame containing only new rows.
+            None
         """
-        filtered = df[~df[id_column].isin(existing_ids)]
-        logger.debug(f"[{id_column}] Filtered {len(df) - len(filtered)} duplicate rows.")
-        return filtered
+        cursor.execute("SET LOCAL work_mem = '256MB';")
 
-    def insert_upsert(cursor, df, table, key_column):
+    def stage_and_merge(cursor, df, table, key_column):
         """
-        Insert new rows or update existing ones using PostgreSQL UPSERT.
+        Insert rows that are not yet in the target table, letting PostgreSQL find them.
+
+        The DataFrame is copied into a temp staging table in one COPY, then a single
+        INSERT ... SELECT anti-joins it against the target on the key column, so the
+        existing keys never leave the server. ON CONFLICT DO UPDATE keeps the merge
+        safe against rows written concurrently by another session.
 
         Args:
             cursor (psycopg2 cursor): Active database cursor.
-            df (pd.DataFrame): Data to be inserted or updated.
+            df (pd.DataFrame): Incoming rows, possibly overlapping existing ones or repeating a key.
             table (str): Target table name.
-            key_column (str): Primary key column for conflict resolution.
+            key_column (str): Primary key column used for the join and conflict resolution.
 
         Returns:
-            None
+            pd.DataFrame: The subset of rows that were newly inserted.
         """
-        """
-        Perform an upsert (insert or update) into the target table using the key column.
-        Uses ON CONFLICT DO UPDATE to maintain consistency.
-        """
-        # Prevent unnecessary upserts on empty DataFrames
+        # Prevent unnecessary round trips on empty DataFrames
         if df.empty:
-            logger.info(f"[{table}] No new data to insert or update.")
-            return
+            return df
+
+        # A key repeated within one batch would make the upsert touch its own row
+        # twice, which PostgreSQL rejects, so only its last occurrence is kept. This only
+        # covers a single batch: when sales are streamed in chunks, a key already merged
+        # from an earlier chunk is skipped by the anti-join, so the first chunk's row wins.
+        df = df.drop_duplicates(key_column, keep="last")
 
         try:
-            df = df.astype(object)
-            records = df.values.tolist()
-            columns = ', '.join(df.columns)
-            placeholders = ', '.join(['%s'] * len(df.columns))
-            update_cols = ', '.join([f"{col} = EXCLUDED.{col}" for col in df.columns if col != key_column])
-            query = f"""
-                INSERT INTO {table} ({columns})
-                VALUES ({placeholders})
-                ON CONFLICT ({key_column}) DO UPDATE SET {update_cols}
-            """
-            cursor.executemany(query, records)
-            logger.info(f"[{table}] Inserted/Updated {len(records)} rows.")
+            create_query, copy_query, merge_query, drop_query = build_merge_sql(table, tuple(df.columns), key_column)
+
+            # Stage the rows in a temp table so the server receives them in one COPY
+            cursor.execute(create_query)
+            # Serialize with Arrow's CSV writer: the frames are Arrow-backed, so this
+            # avoids pandas' per-value formatting and feeds COPY straight from Arrow memory
+            sink = pa.BufferOutputStream()
+            pa_csv.write_csv(
+                pa.Table.from_pandas(df, preserve_index=False),
+                sink,
+                write_options=pa_csv.WriteOptions(include_header=False)
+            )
+            cursor.copy_expert(copy_query, pa.BufferReader(sink.getvalue()))
+
+            # Merge only the staged rows whose key is missing from the target
+            cursor.execute(merge_query)
+            inserted_ids = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+            cursor.execute(drop_query)
         except Exception as e:
-            logger.error(f"[{table}] Error during insert_upsert", exc_info=True)
+            logger.error(f"[{table}] Error during stage_and_merge", exc_info=True)
             raise
 
-    # Load all raw datasets
-    raw = load_raw_datasets(data_dir=RAW_DATA_PATH)
+        # A pd.Index lets isin probe pandas' hashtable rather than a Python container
+        new_rows = df[df[key_column].isin(pd.Index(inserted_ids))]
+        logger.debug(f"[{key_column}] Skipped {len(df) - len(new_rows)} existing rows.")
+        if not new_rows.empty:
+            logger.info(f"[{table}] Inserted {len(new_rows)} rows.")
+        return new_rows
+
+    def append_cleaned_rows(df, filename):
+        """
+        Append newly inserted rows to the matching cleaned CSV file.
 
-    # Normalize all column names to lowercase to avoid KeyErrors
-    for name, df in raw.items():
-        df.columns = df.columns.str.lower()
+        The file is opened once with a large write buffer and the header is only
+        written when the file is empty, so no separate existence check is needed.
 
-    # === DimProduct ===
-    start = time.time()
-    products = raw["products"]
-    existing_ids = fetch_existing_ids(conn, "dimproduct", "productid")
-    new_products = filter_new_rows(products, "productid", existing_ids)
-    if new_products.empty:
-        logger.info("[DimProduct] No new rows to insert.")  # Extra clarity before skipping insert
-    else:
-        path = os.path.join(CLEANED_DATA_PATH, "products.csv")
-        new_products.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
-        insert_upsert(cursor, new_products, "dimproduct", "productid")
-    logger.info(f"[DimProduct] Completed in {time.time() - start:.2f} seconds")
+        Args:
+            df (pd.DataFrame): Rows to append.
+            filename (str): Name of the cleaned CSV file in CLEANED_DATA_PATH.
+
+        Returns:
+            None
+        """
+        path = os.path.join(CLEANED_DATA_PATH, filename)
+        with open(path, "a", newline="", buffering=1 << 20) as f:
+            df.to_csv(f, header=f.tell() == 0, index=False)
 
+    def publish_pending_rows(pending_path, filename):
+        """
+        Move rows spooled in a pending file into the matching cleaned CSV file.
 
+        The pending file is renamed into place when the cleaned file does not exist
+        yet; otherwise its rows (without the header) are appended to it.
 
-    # === DimStore ===
-    start = time.time()
-    stores = standardize_city_names(raw["stores"], raw["cities_lookup"])
-    existing_ids = fetch_existing_ids(conn, "dimstore", "storeid")
-    new_stores = filter_new_rows(stores, "storeid", existing_ids)
-    if new_stores.empty:
-        logger.info("[DimStore] No new rows to insert.")  # New condition to log empty
-    else:
-        path = os.path.join(CLEANED_DATA_PATH, "stores.csv")
-        new_stores.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
-        insert_upsert(cursor, new_stores, "dimstore", "storeid")
-    logger.info(f"[DimStore] Completed in {time.time() - start:.2f} seconds")
-
-    # === DimDate ===
-    start = time.time()
-    calendar = parse_calendar_dates(raw["calendar"])
-    existing_ids = fetch_existing_ids(conn, "dimdate", "dateid")
-    new_dates = filter_new_rows(calendar, "dateid", existing_ids)
-    if new_dates.empty:
-        logger.info("[DimDate] No new rows to insert.")
-    else:
-        path = os.path.join(CLEANED_DATA_PATH, "calendar.csv")
-        new_dates.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
-        insert_upsert(cursor, new_dates, "dimdate", "dateid")
-    logger.info(f"[DimDate] Completed in {time.time() - start:.2f} seconds")
+        Args:
+            pending_path (str): Path of the pending CSV file, written with a header.
+            filename (str): Name of the cleaned CSV file in CLEANED_DATA_PATH.
+
+        Returns:
+            None
+        """
+        path = os.path.join(CLEANED_DATA_PATH, filename)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            os.replace(pending_path, path)
+            return
+        with open(pending_path, "r", newline="") as src, open(path, "a", newline="") as dst:
+            src.readline()
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+    def load_dimension(df, table, key_column, label, filename):
+        """
+        Merge new rows into one dimension table on a dedicated connection.
+
+        psycopg2 connections must not be shared between threads, so each
+        dimension job opens, commits and closes its own.
+
+        Args:
+            df (pd.DataFrame): Cleaned dimension rows.
+            table (str): Target table name.
+            key_column (str): Primary key column.
+            label (str): Table name used in log messages.
+            filename (str): Name of the cleaned CSV file to append new rows to.
+
+        Returns:
+            None
+        """
+        start = time.time()
+        dim_conn = psycopg2.connect(**db_config)
+        try:
+            with dim_conn:
+                with dim_conn.cursor() as dim_cursor:
+                    set_bulk_load_options(dim_cursor)
+                    new_rows = stage_and_merge(dim_cursor, df, table, key_column)
+        finally:
+            dim_conn.close()
+
+        if new_rows.empty:
+            logger.info(f"[{label}] No new rows to insert.")
+        else:
+            append_cleaned_rows(new_rows, filename)
+        logger.info(f"[{label}] Completed in {time.time() - start:.2f} seconds")
+
+    # Load all raw datasets
+    # (sales is streamed in chunks further down instead)
+    raw = load_raw_datasets(data_dir=RAW_DATA_PATH, tables=["calendar", "cities_lookup", "products", "stores"])
+
+    # Check the sales file and header now, so a bad file fails before any dimension commits
+    sales_chunks = iter_raw_chunks("sales", data_dir=RAW_DATA_PATH)
+
+    # === Dimensions ===
+    # DimProduct, DimStore and DimDate do not depend on each other, so they are
+    # merged concurrently; FactSales references all three and waits for them.
+    dimension_jobs = [
+        (raw["products"], "dimproduct", "productid", "DimProduct", "products.csv"),
+        (standardize_city_names(raw["stores"], raw["cities_lookup"]), "dimstore", "storeid", "DimStore", "stores.csv"),
+        (parse_calendar_dates(raw["calendar"]), "dimdate", "dateid", "DimDate", "calendar.csv")
+    ]
+    with ThreadPoolExecutor(max_workers=len(dimension_jobs)) as executor:
+        futures = [executor.submit(load_dimension, *job) for job in dimension_jobs]
+        for future in futures:
+            future.result()
 
     # === FactSales ===
+    # Each chunk is merged as soon as it is parsed and its new rows are spooled to a
+    # pending file next to sales.csv, so only one chunk is held in memory at a time
     start = time.time()
-    sales = raw["sales"]
-    sales["dateid"] = sales["dateid"].astype(int)
-    existing_ids = fetch_existing_ids(conn, "factsales", "salesid")
-    new_sales = filter_new_rows(sales, "salesid", existing_ids)
-    if new_sales.empty:
+    set_bulk_load_options(cursor)
+    pending_path = os.path.join(CLEANED_DATA_PATH, "sales.csv.pending")
+    inserted_count = 0
+    try:
+        with open(pending_path, "w", newline="", buffering=1 << 20) as pending:
+            for sales in sales_chunks:
+                new_sales = stage_and_merge(cursor, sales, "factsales", "salesid")
+                if not new_sales.empty:
+                    new_sales.to_csv(pending, header=pending.tell() == 0, index=False)
+                    inserted_count += len(new_sales)
+
+        # Commit FactSales inserts/updates (dimensions were committed by their workers)
+        conn.commit()
+
+        # Only record rows in the cleaned CSV once the transaction holding them has committed
+        if inserted_count:
+            publish_pending_rows(pending_path, "sales.csv")
+    finally:
+        if os.path.exists(pending_path):
+            os.remove(pending_path)
+
+    if inserted_count == 0:
         logger.info("[FactSales] No new rows to insert.")
-    else:
-        path = os.path.join(CLEANED_DATA_PATH, "sales.csv")
-        new_sales.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
-        insert_upsert(cursor, new_sales, "factsales", "salesid")
     logger.info(f"[FactSales] Completed in {time.time() - start:.2f} seconds")
 
-    # Commit all inserts/updates
-    conn.commit()
-
     # Refresh views and indexes
     try:
         with conn.cursor() as view_cursor:
-            execute_sql_file(view_cursor, "kpi_views.sql")
-            execute_sql_file(view_cursor, "kpi_indexes.sql")
+            execute_sql_files(view_cursor, "kpi_views.sql", "kpi_indexes.sql")
+        conn.commit()
         logger.info("KPI views and indexes refreshed after incremental ETL.")
     except Exception as e:
         logger.exception("Error creating KPI views/indexes after incremental load")
@@ -210,22 +321,6 @@ def run_incremental_clean_and_load_all():
     logger.info("[Incremental ETL] All new rows inserted and committed.")
     logger.info(f"[Incremental ETL] Finished in {time.time() - etl_start:.2f} seconds.")
 
-def execute_sql_file(cursor, filename):
-    """
-    Execute an SQL script from a file.
-
-    Args:
-        cursor (psycopg2 cursor): Active database cursor.
-        filename (str): Name of the SQL file in the /sql directory.
-
-    Returns:
-        None
-    """
-    sql_path = os.path.join("sql", filename)
-    with open(sql_path, "r") as f:
-        sql_script = f.read()
-        cursor.execute(sql_script)
-
 def should_use_incremental():
     """
     Detects if DimProduct already contains rows, meaning we should run incremental mode.
@@ -241,10 +336,18 @@ def should_use_incremental():
             password=os.environ["DB_PASS"]
         )
         with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM dimproduct;")
-            count = cur.fetchone()[0]
+            # to_regclass returns NULL for a missing table instead of raising, so this
+            # yields false rather than an error. The EXISTS probe has to be a separate
+            # statement, since a query naming a missing table fails to parse.
+            cur.execute("SELECT to_regclass('dimproduct') IS NOT NULL;")
+            table_exists = cur.fetchone()[0]
+            has_rows = False
+            if table_exists:
+                # Stops at the first row instead of scanning the whole table like COUNT(*)
+                cur.execute("SELECT EXISTS (SELECT 1 FROM dimproduct);")
+                has_rows = cur.fetchone()[0]
         conn.close()
-        return count > 0
+        return has_rows
     except Exception as e:
         logger.warning("Could not connect to DB to check for incremental mode. Defaulting to full load.", exc_info=True)
         return False
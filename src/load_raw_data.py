@@ -1,3 +1,4 @@
+import csv
 import pandas as pd
 import os
 from .config import RAW_DATA_PATH
@@ -5,7 +6,69 @@ from .logger import setup_logger
 
 logger = setup_logger()
 
-def load_raw_datasets(data_dir=RAW_DATA_PATH):
+# Raw file for each table
+FILE_MAP = {
+    "calendar": "calendar.csv",
+    "cities_lookup": "cities_lookup.csv",
+    "products": "products.csv",
+    "sales": "sales.csv",
+    "stores": "stores.csv"
+}
+
+# Columns read from each raw file (anything else in the file is skipped at parse time).
+# Names are lowercase and matched against the file header case-insensitively.
+COLUMN_MAP = {
+    "calendar": ["dateid", "date", "year", "quarter", "month", "day", "weekday"],
+    "cities_lookup": ["rawcity", "standardcity"],
+    "products": ["productid", "productname", "category", "subcategory", "costprice", "saleprice"],
+    "sales": ["salesid", "dateid", "productid", "storeid", "qtysold", "revenue"],
+    "stores": ["storeid", "storename", "city", "region"]
+}
+
+# Explicit dtypes for text columns and sales keys (other numeric columns are inferred by Arrow).
+# Sales keys are pinned so no cast is needed later; int32 matches the INT columns in the schema.
+DTYPE_MAP = {
+    "calendar": {"weekday": "string[pyarrow]"},
+    "cities_lookup": {"rawcity": "string[pyarrow]", "standardcity": "string[pyarrow]"},
+    "products": {"productname": "string[pyarrow]", "category": "string[pyarrow]", "subcategory": "string[pyarrow]"},
+    "sales": {"salesid": "int64[pyarrow]", "dateid": "int32[pyarrow]", "productid": "int32[pyarrow]", "storeid": "int32[pyarrow]"},
+    "stores": {"storename": "string[pyarrow]", "city": "string[pyarrow]", "region": "string[pyarrow]"}
+}
+
+DATE_COLUMNS = {"calendar": ["date"]}
+
+def resolve_read_options(name, path):
+    """
+    Map the expected columns of a raw file onto the names used in its header.
+
+    read_csv matches usecols, dtype and parse_dates keys by exact name, so the
+    header is read once and matched case-insensitively to tolerate case drift.
+
+    Args:
+        name (str): Table name, as used in FILE_MAP.
+        path (str): Full path to the raw CSV file.
+
+    Returns:
+        dict: usecols, dtype and parse_dates keyword arguments for pd.read_csv.
+
+    Raises:
+        ValueError: If an expected column is missing from the header.
+    """
+    with open(path, "r", newline="") as f:
+        header = next(csv.reader(f), [])
+    by_lower = {col.lower(): col for col in header}
+
+    missing = [col for col in COLUMN_MAP[name] if col not in by_lower]
+    if missing:
+        raise ValueError(f"Missing columns in {FILE_MAP[name]}: {missing}")
+
+    return {
+        "usecols": [by_lower[col] for col in COLUMN_MAP[name]],
+        "dtype": {by_lower[col]: dtype for col, dtype in DTYPE_MAP[name].items()},
+        "parse_dates": [by_lower[col] for col in DATE_COLUMNS.get(name, [])] or None
+    }
+
+def load_raw_datasets(data_dir=RAW_DATA_PATH, tables=None):
     """
     Load all raw CSV files from the given directory into a dictionary of DataFrames.
 
@@ -18,23 +81,26 @@ def load_raw_datasets(data_dir=RAW_DATA_PATH):
 
     Args:
         data_dir (str): Path to the directory containing raw CSVs.
+        tables (list): Optional subset of table names to load. Defaults to all.
 
     Returns:
-        dict: Dictionary where keys are table names and values are DataFrames.
+        dict: Dictionary where keys are table names and values are DataFrames
+        (with lowercase column names).
     """
-    file_map = {
-        "calendar": "calendar.csv",
-        "cities_lookup": "cities_lookup.csv",
-        "products": "products.csv",
-        "sales": "sales.csv",
-        "stores": "stores.csv"
-    }
-
     dataframes = {}
-    for name, filename in file_map.items():
+    for name in tables or FILE_MAP:
+        filename = FILE_MAP[name]
         path = os.path.join(data_dir, filename)
         try:
-            df = pd.read_csv(path)
+            # Arrow's multithreaded CSV reader, keeping Arrow-backed columns
+            df = pd.read_csv(
+                path,
+                engine="pyarrow",
+                dtype_backend="pyarrow",
+                **resolve_read_options(name, path)
+            )
+            # Normalize column names once here so downstream steps can rely on lowercase
+            df.columns = df.columns.str.lower()
             dataframes[name] = df
             logger.info(f"Loaded '{name}' ({df.shape[0]} rows, {df.shape[1]} columns)")
         except FileNotFoundError:
@@ -45,3 +111,49 @@ def load_raw_datasets(data_dir=RAW_DATA_PATH):
             logger.exception(f"ERROR loading '{filename}': {e}")
 
     return dataframes
+
+def iter_raw_chunks(name, data_dir=RAW_DATA_PATH, chunksize=1_000_000):
+    """
+    Stream one raw CSV file in chunks instead of loading it whole.
+
+    Keeps peak memory bounded for large files such as sales.csv: chunks are
+    parsed one at a time, and the next one is only read once the caller asks for it.
+    The file and its header are checked when this function is called, before the
+    first chunk is requested, so a missing file or column fails early.
+
+    Args:
+        name (str): Table name, as used in load_raw_datasets.
+        data_dir (str): Path to the directory containing raw CSVs.
+        chunksize (int): Maximum number of rows per chunk. Default is 1,000,000.
+
+    Returns:
+        Iterator[DataFrame]: Chunks of the raw file (with lowercase column names).
+
+    Raises:
+        FileNotFoundError: If the raw file does not exist.
+        ValueError: If an expected column is missing from the header.
+    """
+    filename = FILE_MAP[name]
+    path = os.path.join(data_dir, filename)
+    try:
+        read_options = resolve_read_options(name, path)
+    except FileNotFoundError:
+        logger.error(f"ERROR: File not found -> {filename}")
+        raise
+    except Exception as e:
+        logger.exception(f"ERROR loading '{filename}': {e}")
+        raise
+
+    def chunks():
+        try:
+            # The pyarrow engine cannot read in chunks, so the C parser is used here
+            with pd.read_csv(path, dtype_backend="pyarrow", chunksize=chunksize, **read_options) as reader:
+                for chunk in reader:
+                    chunk.columns = chunk.columns.str.lower()
+                    logger.info(f"Loaded '{name}' chunk ({chunk.shape[0]} rows, {chunk.shape[1]} columns)")
+                    yield chunk
+        except pd.errors.ParserError:
+            logger.error(f"ERROR: Failed to parse -> {filename}")
+            raise
+
+    return chunks()
@@ -1,6 +1,7 @@
+import csv
 import os
 import psycopg2
-import pandas as pd
+from psycopg2 import sql
 import time
 from .load_raw_data import load_raw_datasets
 from .config import CLEANED_DATA_PATH
@@ -10,8 +11,8 @@ logger = setup_logger()
 
 def load_csv_to_table(cursor, filepath, table_name):
     """
-    Load data from a CSV file into a PostgreSQL table.
-    Clears the table before inserting new data.
+    Load data from a CSV file into a PostgreSQL table using COPY.
+    Clears the table before streaming the file to the server.
 
     Args:
         cursor (psycopg2 cursor): Database cursor.
@@ -23,15 +24,19 @@ def load_csv_to_table(cursor, filepath, table_name):
     """
     logger.info(f"Loading {table_name} from {filepath}")
     try:
-        df = pd.read_csv(filepath)
         cursor.execute(f"DELETE FROM {table_name}")
-        df = df.astype(object)
-        records = df.values.tolist()
-        columns = ', '.join(df.columns)
-        placeholders = ', '.join(['%s'] * len(df.columns))
-        insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        cursor.executemany(insert_query, records)
-        logger.info(f"Inserted {len(records)} rows into {table_name}")
+
+        # The cleaned CSV already matches the table layout, so it is streamed
+        # as-is; only its header is read to build the COPY column list.
+        with open(filepath, "r", newline="") as f:
+            # Unquoted names in the schema are folded to lowercase by PostgreSQL
+            columns = [col.lower() for col in next(csv.reader(f))]
+            copy_query = sql.SQL("COPY {table} ({columns}) FROM STDIN WITH (FORMAT CSV)").format(
+                table=sql.Identifier(table_name.lower()),
+                columns=sql.SQL(', ').join(map(sql.Identifier, columns))
+            )
+            cursor.copy_expert(copy_query, f)
+        logger.info(f"Inserted {cursor.rowcount} rows into {table_name}")
     except Exception as e:
         logger.error(f"Error loading table {table_name} from {filepath}", exc_info=True)
         raise
@@ -162,28 +167,32 @@ def run_load():
         conn = psycopg2.connect(**db_config)
         with conn:
             with conn.cursor() as cursor:
-                execute_sql_file(cursor, "kpi_views.sql")
-                execute_sql_file(cursor, "kpi_indexes.sql")
+                execute_sql_files(cursor, "kpi_views.sql", "kpi_indexes.sql")
         logger.info("KPI views and indexes created successfully.")
     except Exception as e:
         logger.exception("Error creating KPI views/indexes")
 
-def execute_sql_file(cursor, filename):
+def execute_sql_files(cursor, *filenames):
     """
-    Execute a SQL script file using the given database cursor.
+    Execute one or more SQL script files in a single round trip.
+
+    The scripts are concatenated and sent as one multi-statement query,
+    so PostgreSQL parses and runs them as a single batch.
 
     Args:
         cursor (psycopg2 cursor): Active cursor to execute SQL.
-        filename (str): SQL filename in the `sql/` directory.
+        *filenames (str): SQL filenames in the `sql/` directory, run in order.
 
     Returns:
         None
     """
-    sql_path = os.path.join("sql", filename)
-    with open(sql_path, "r") as f:
-        sql_script = f.read()
-        cursor.execute(sql_script)
-    logger.info(f"Executed SQL file: {filename}")
+    scripts = []
+    for filename in filenames:
+        sql_path = os.path.join("sql", filename)
+        with open(sql_path, "r") as f:
+            scripts.append(f.read())
+    cursor.execute(";\n".join(scripts))
+    logger.info(f"Executed SQL files: {', '.join(filenames)}")
 
 def clear_table(table_name, db_config):
     """
@@ -1,4 +1,5 @@
 import os
+import functools
 import logging
 import time
 from .config import LOGS_PATH
@@ -6,6 +7,7 @@ from .config import LOGS_PATH
 # Force all log timestamps to use local time instead of UTC
 logging.Formatter.converter = time.localtime
 
+@functools.lru_cache(maxsize=None)
 def setup_logger(log_name: str = "cityretail.etl", log_file: str = "etl.log") -> logging.Logger:
     """
     Set up a logger that writes both to a file and the console, using local timestamps.
@@ -17,8 +19,8 @@ def setup_logger(log_name: str = "cityretail.etl", log_file: str = "etl.log") ->
     Returns:
         logging.Logger: Configured logger instance.
     """
-    # Ensure log directory exists
-    os.makedirs(LOGS_PATH, exist_ok=True)
+    # LOGS_PATH is created by config at import time; repeat calls with the
+    # same arguments return the cached logger without reconfiguring it
 
     # Create the full path for the log file
     log_path = os.path.join(LOGS_PATH, log_file)